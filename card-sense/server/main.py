@@ -1,32 +1,134 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse, Response, PlainTextResponse
+from pydantic import BaseModel, ConfigDict, StringConstraints
+from typing import List, Optional, Dict, Any, Tuple, Union, AsyncIterator, Set, Annotated
 import base64
 import os
-import requests
+import asyncio
+import httpx
 import fitz  # PyMuPDF
 import io
 from dotenv import load_dotenv
 import json
+import orjson
+import random
 import re
 import uuid
+import secrets
+import zlib
+import hashlib
+import tempfile
+import time
+import threading
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from collections import OrderedDict
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+try:
+    import hyperscan  # Optional: single-pass multi-pattern scanning
+except ImportError:
+    hyperscan = None
+
+try:
+    import ahocorasick  # Optional: multi-literal bank name matching
+except ImportError:
+    ahocorasick = None
+
+try:
+    import zstandard  # Optional: faster session blob compression than zlib
+except ImportError:
+    zstandard = None
+
+try:
+    import redis.asyncio as aioredis  # Optional: session storage shared across workers
+except ImportError:
+    aioredis = None
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared Gemini HTTP client and session store, close them on shutdown"""
+    global session_store, pdf_extraction_pool
+    # Thread pool behind asyncio.to_thread (PDF extraction, pattern matching)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=DEFAULT_EXECUTOR_WORKERS))
+    # Shared async HTTP client so concurrent Gemini calls reuse pooled TLS/HTTP2 connections
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=httpx.Timeout(30.0)
+    )
+    session_store = create_session_store()
+    # PyMuPDF holds the GIL while parsing, so page ranges are extracted in
+    # separate processes; spawn avoids forking the running event loop's threads
+    pdf_extraction_pool = ProcessPoolExecutor(
+        max_workers=PDF_EXTRACTION_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    app.state.chat_cache = ChatAnswerCache(
+        CHAT_CACHE_TTL_SECONDS,
+        redis=session_store.redis if isinstance(session_store, RedisSessionStore) else None
+    )
+    app.state.chat_batcher = ChatBatcher(CHAT_BATCH_WINDOW_SECONDS, CHAT_BATCH_MAX_SIZE)
+    app.state.chat_batcher.start()
+    try:
+        yield
+    finally:
+        await app.state.chat_batcher.stop()
+        await app.state.http.aclose()
+        await session_store.close()
+        pdf_extraction_pool.shutdown(cancel_futures=True)
+        pdf_extraction_pool = None
+
 app = FastAPI(
     title="Credit Card Statement Parser",
     description="API for OCR processing and chat with credit card statements",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+class OrjsonResponse(JSONResponse):
+    """
+    JSON response encoded with orjson, for routes that return plain dicts.
+    Routes with a response_model are left to FastAPI, which serializes
+    them straight to bytes through Pydantic
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
 # Configuration
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = "gemini-2.0-flash-exp"
+GEMINI_MAX_STATEMENT_CHARS = 20000
+GEMINI_REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "15"))  # Seconds per attempt
+# The 10-point extraction sends a whole statement and asks for every transaction,
+# so a healthy answer takes much longer than a chat reply
+GEMINI_EXTRACTION_TIMEOUT = float(os.getenv("GEMINI_EXTRACTION_TIMEOUT", "60"))
+GEMINI_MAX_ATTEMPTS = 3
+GEMINI_MAX_RETRY_AFTER_SECONDS = 10.0
+GEMINI_STREAM_COALESCE_SECONDS = 0.03  # Merge streamed tokens arriving within this window
+CHAT_BATCH_WINDOW_SECONDS = 0.025  # /chat questions arriving within this window share one Gemini call
+CHAT_BATCH_MAX_SIZE = 8
+CHAT_QUESTION_MAX_CHARS = 4096
+CHAT_CACHE_TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+CHAT_CACHE_MAX_ENTRIES = 1024  # In-memory cache only; Redis relies on the TTL
+PDF_EXTRACTION_WORKERS = min(os.cpu_count() or 1, 4)
+DEFAULT_EXECUTOR_WORKERS = 32
+PDF_IN_MEMORY_MAX_BYTES = 10 << 20  # Larger uploads are spooled to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
+REDIS_URL = os.getenv("REDIS_URL")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "256"))  # Per worker, in-memory store only
+REDIS_MAX_CONNECTIONS = 32
+REDIS_POOL_TIMEOUT_SECONDS = 5  # Wait for a free pooled connection before failing
 
 # CORS middleware setup
 origins = [
@@ -44,11 +146,534 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global storage for extracted content (in production, use database)
-extracted_contents = {}
+# Compress larger JSON bodies such as /sessions and /session/{id}
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Session blobs (text, tables, pages) are kept compressed and only inflated
+# when a handler needs the content; zstd frames are recognised by their magic
+# number so blobs written with either codec can be read back
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_ZSTD_COMPRESSOR = zstandard.ZstdCompressor(level=3) if zstandard else None
+_ZSTD_DECOMPRESSOR = zstandard.ZstdDecompressor() if zstandard else None
+
+def compress_session_blob(content: Dict[str, Any]) -> bytes:
+    data = orjson.dumps(content)
+    if _ZSTD_COMPRESSOR is not None:
+        return _ZSTD_COMPRESSOR.compress(data)
+    return zlib.compress(data, 3)
+
+def decompress_session_blob(blob: bytes) -> Dict[str, Any]:
+    if blob.startswith(_ZSTD_MAGIC):
+        if _ZSTD_DECOMPRESSOR is None:
+            raise RuntimeError("Session was stored with zstd but the zstandard package is not installed")
+        return orjson.loads(_ZSTD_DECOMPRESSOR.decompress(blob))
+    return orjson.loads(zlib.decompress(blob))
+
+def summarize_session(content: Dict[str, Any]) -> Dict[str, Any]:
+    """Small per-session summary, computed once at write time for listings"""
+    return {
+        "filename": content.get("filename", "Unknown"),
+        "processed_at": content.get("processed_at", "Unknown"),
+        "text_length": len(content.get("text", "")),
+        "tables_count": len(content.get("tables", [])),
+        "pages_count": len(content.get("pages", [])),
+        "images_count": content.get("images_count", 0),
+        "has_extracted_10_data": "extracted_10_data" in content,
+        "pdf_hash": content.get("pdf_hash")
+    }
+
+class SessionStore(ABC):
+    """
+    Storage for extracted content, keyed by session ID. Each session is kept as
+    a compressed heavy blob (text, tables, pages) plus a small uncompressed
+    summary, so listings never touch the blobs.
+
+    Also caches, by hash of the uploaded PDF bytes, the session holding that
+    PDF's extraction and its 10-point extraction, so re-uploading the same
+    statement skips PyMuPDF and Gemini. These entries are dropped together
+    with the session they came from.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_meta(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, session_id: str, content: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Delete a session, returning whether a live (unexpired) session existed"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def meta_items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_upload_session(self, pdf_hash: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_upload_session(self, pdf_hash: str, session_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_extracted_10(self, pdf_hash: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_extracted_10(self, pdf_hash: str, extracted_10_data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local storage; sessions are only visible to a single worker.
+    Holds at most max_sessions, evicting the least recently used, and expires
+    sessions ttl_seconds after they were last written. Evicted and deleted
+    sessions take their upload-hash cache entries with them, so those stay
+    bounded too.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: int):
+        self._max_sessions = max_sessions
+        self._ttl_seconds = ttl_seconds
+        # Ordered from least to most recently used
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._expires_at: Dict[str, float] = {}
+        self._upload_sessions: Dict[str, str] = {}
+        self._extracted_10: Dict[str, Dict[str, Any]] = {}
+
+    def _evict(self, session_id: str) -> None:
+        self._discard(session_id, self._meta.pop(session_id))
+
+    def _discard(self, session_id: str, meta: Dict[str, Any]) -> None:
+        # Removes everything but the metadata, which the caller has already popped
+        del self._blobs[session_id]
+        del self._expires_at[session_id]
+        pdf_hash = meta["pdf_hash"]
+        # A re-upload of the same PDF may have moved the hash to a live session
+        if pdf_hash is not None and self._upload_sessions.get(pdf_hash) == session_id:
+            del self._upload_sessions[pdf_hash]
+            self._extracted_10.pop(pdf_hash, None)
+
+    def _live(self, session_id: str) -> bool:
+        expires_at = self._expires_at.get(session_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            self._evict(session_id)
+            return False
+        return True
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if not self._live(session_id):
+            return None
+        self._blobs.move_to_end(session_id)
+        return decompress_session_blob(self._blobs[session_id])
+
+    async def get_meta(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._meta[session_id] if self._live(session_id) else None
+
+    async def set(self, session_id: str, content: Dict[str, Any]) -> None:
+        self._blobs[session_id] = compress_session_blob(content)
+        self._blobs.move_to_end(session_id)
+        self._meta[session_id] = summarize_session(content)
+        self._expires_at[session_id] = time.monotonic() + self._ttl_seconds
+        while len(self._blobs) > self._max_sessions:
+            self._evict(next(iter(self._blobs)))
+
+    async def delete(self, session_id: str) -> bool:
+        meta = self._meta.pop(session_id, None)
+        if meta is None:
+            return False
+        # An expired session not yet swept is removed but reported as missing
+        expired = self._expires_at[session_id] <= time.monotonic()
+        self._discard(session_id, meta)
+        return not expired
+
+    async def meta_items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return [
+            (session_id, self._meta[session_id])
+            for session_id in list(self._blobs)
+            if self._live(session_id)
+        ]
+
+    async def get_upload_session(self, pdf_hash: str) -> Optional[str]:
+        return self._upload_sessions.get(pdf_hash)
+
+    async def set_upload_session(self, pdf_hash: str, session_id: str) -> None:
+        self._upload_sessions[pdf_hash] = session_id
+
+    async def get_extracted_10(self, pdf_hash: str) -> Optional[Dict[str, Any]]:
+        return self._extracted_10.get(pdf_hash)
+
+    async def set_extracted_10(self, pdf_hash: str, extracted_10_data: Dict[str, Any]) -> None:
+        self._extracted_10[pdf_hash] = extracted_10_data
+
+class RedisSessionStore(SessionStore):
+    """Redis storage shared by all workers; sessions expire after ttl_seconds.
+
+    Session IDs are also kept in a sorted set scored by expiry time, so
+    /sessions reads the index and fetches every session summary with a single
+    MGET instead of scanning the keyspace. Upload-hash cache entries share the
+    session TTL and are removed when their session is deleted.
+    """
+
+    KEY_PREFIX = "session:"
+    META_KEY_PREFIX = "session_meta:"
+    INDEX_KEY = "sessions"
+    UPLOAD_KEY_PREFIX = "upload_session:"
+    EXTRACTED_10_KEY_PREFIX = "extracted_10:"
+
+    def __init__(self, url: str, ttl_seconds: int, max_connections: int, pool_timeout: float):
+        # Requests beyond max_connections wait for a free connection instead of failing
+        self._pool = aioredis.BlockingConnectionPool.from_url(
+            url, max_connections=max_connections, timeout=pool_timeout
+        )
+        self._redis = aioredis.Redis(connection_pool=self._pool)
+        self._ttl_seconds = ttl_seconds
+
+    @property
+    def redis(self) -> "aioredis.Redis":
+        return self._redis
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._redis.get(self.KEY_PREFIX + session_id)
+        return decompress_session_blob(data) if data is not None else None
+
+    async def get_meta(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._redis.get(self.META_KEY_PREFIX + session_id)
+        return orjson.loads(data) if data is not None else None
+
+    async def set(self, session_id: str, content: Dict[str, Any]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.KEY_PREFIX + session_id, compress_session_blob(content), ex=self._ttl_seconds)
+            pipe.set(self.META_KEY_PREFIX + session_id, orjson.dumps(summarize_session(content)), ex=self._ttl_seconds)
+            pipe.zadd(self.INDEX_KEY, {session_id: time.time() + self._ttl_seconds})
+            await pipe.execute()
+
+    async def delete(self, session_id: str) -> bool:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(self.KEY_PREFIX + session_id)
+            pipe.getdel(self.META_KEY_PREFIX + session_id)
+            pipe.zrem(self.INDEX_KEY, session_id)
+            deleted, meta, _ = await pipe.execute()
+        pdf_hash = orjson.loads(meta).get("pdf_hash") if meta is not None else None
+        if pdf_hash is not None:
+            await self._delete_upload_cache(pdf_hash, session_id)
+        return deleted > 0
+
+    async def _delete_upload_cache(self, pdf_hash: str, session_id: str) -> None:
+        # Only drop the hash entries while they still point at this session; a
+        # re-upload may have moved them to a live one. WATCH makes the check
+        # and the delete atomic
+        upload_key = self.UPLOAD_KEY_PREFIX + pdf_hash
+        async with self._redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(upload_key)
+                if await pipe.get(upload_key) != session_id.encode():
+                    return
+                pipe.multi()
+                pipe.delete(upload_key, self.EXTRACTED_10_KEY_PREFIX + pdf_hash)
+                await pipe.execute()
+            except aioredis.WatchError:
+                # The entry changed under us, so it no longer belongs to this session
+                pass
+
+    async def meta_items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        # Drop index entries whose session keys have already expired
+        await self._redis.zremrangebyscore(self.INDEX_KEY, "-inf", time.time())
+        session_ids = [session_id.decode() for session_id in await self._redis.zrange(self.INDEX_KEY, 0, -1)]
+        if not session_ids:
+            return []
+        values = await self._redis.mget([self.META_KEY_PREFIX + session_id for session_id in session_ids])
+        return [
+            (session_id, orjson.loads(value))
+            for session_id, value in zip(session_ids, values)
+            if value is not None
+        ]
+
+    async def get_upload_session(self, pdf_hash: str) -> Optional[str]:
+        session_id = await self._redis.get(self.UPLOAD_KEY_PREFIX + pdf_hash)
+        return session_id.decode() if session_id is not None else None
+
+    async def set_upload_session(self, pdf_hash: str, session_id: str) -> None:
+        await self._redis.set(self.UPLOAD_KEY_PREFIX + pdf_hash, session_id, ex=self._ttl_seconds)
+
+    async def get_extracted_10(self, pdf_hash: str) -> Optional[Dict[str, Any]]:
+        data = await self._redis.get(self.EXTRACTED_10_KEY_PREFIX + pdf_hash)
+        return orjson.loads(data) if data is not None else None
+
+    async def set_extracted_10(self, pdf_hash: str, extracted_10_data: Dict[str, Any]) -> None:
+        await self._redis.set(self.EXTRACTED_10_KEY_PREFIX + pdf_hash, orjson.dumps(extracted_10_data), ex=self._ttl_seconds)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+        await self._pool.disconnect()
+
+def create_session_store() -> SessionStore:
+    """Use Redis when REDIS_URL is configured, otherwise keep sessions in memory"""
+    if REDIS_URL:
+        if aioredis is None:
+            raise RuntimeError("REDIS_URL is set but the redis package is not installed")
+        return RedisSessionStore(
+            REDIS_URL, SESSION_TTL_SECONDS, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT_SECONDS
+        )
+    return InMemorySessionStore(MAX_SESSIONS, SESSION_TTL_SECONDS)
+
+# Global storage for extracted content, created in lifespan() on startup
+session_store: Optional[SessionStore] = None
+
+# Precompiled extraction patterns (compiled once at import, reused per request)
+_CARD_NUMBER_MASKED_RE = re.compile(r'Card Number\s*[:]?\s*(\d{4}[\*]+\d{4})', re.IGNORECASE)
+_CARD_NO_RE = re.compile(r'Card No\s*[:]?\s*(\d{4}[\s\*]+\d{4})', re.IGNORECASE)
+_CARD_NUMBER_FULL_RE = re.compile(r'Card Number\s*[:]?\s*(\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4})', re.IGNORECASE)
+_CARD_NUMBER_ANY_RE = re.compile(r'\b\d{4}[\*]+\d{4}\b')
+
+# All amount labels in one alternation, so the text is traversed once; the
+# named group that matched identifies the field, and the value is read from
+# just after the label
+_AMOUNT_LABEL_FIELDS = {
+    "total": "total_amount_due",
+    "minimum": "minimum_amount_due",
+    "limit": "credit_limit",
+    "avail": "available_credit_limit",
+    "opening": "opening_balance",
+}
+_AMOUNTS_RE = re.compile(
+    r'(?P<total>Total Amount Due|Total Due|New Balance)'
+    r'|(?P<minimum>Minimum Amount Due|Min Amount Due|Minimum Due|Min Due)'
+    r'|(?P<limit>Credit Limit|Limit)'
+    r'|(?P<avail>Available Credit Limit|Available Credit|Available Limit)'
+    r'|(?P<opening>Opening Balance|Previous Balance)',
+    re.IGNORECASE
+)
+# The gap after a label is bounded in the pattern itself, so a value is either
+# read whole or not at all
+_AMOUNT_VALUE_RE = re.compile(r'[\s:]{0,50}[₹$]?\s{0,5}([0-9,]+\.?[0-9]*)')
+
+# Gaps between reward fields are capped at 200 characters so a statement
+# missing one of the labels cannot backtrack across the whole document
+_REWARD_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        r'REWARDS\s*SUMMARY\s*Opening Balance\s*(\d+)\s*Rewards Earned\s*(\d+)\s*Redeemed/Adjusted\s*(\d+)\s*Closing Balance\s*(\d+)',
+        r'Reward Points[\s\S]{0,200}?Opening Balance\s*(\d+)[\s\S]{0,200}?Earned\s*(\d+)[\s\S]{0,200}?Closing Balance\s*(\d+)',
+        r'Opening Balance\s*(\d+)\s*Rewards Earned\s*(\d+)\s*Closing Balance\s*(\d+)',
+    ]
+]
+
+# Transaction section runs until the next sentinel, consuming one character at
+# a time (no backtracking) and capped at 200k characters
+_TRANSACTION_SECTION_RE = re.compile(
+    r'YOUR TRANSACTIONS((?:(?!KEY OFFERS|Page \d+ of \d+)[\s\S]){0,200000})', re.IGNORECASE
+)
+# Transaction rows (date, description, amount, optional CR). The description
+# cannot contain digits or newlines and is length-bounded, so it never overlaps
+# the amount and a near-miss row cannot backtrack across the rest of the section.
+# The CR marker may follow the amount directly ("500.00CR") or on the next line
+_TRANSACTION_ROW_RE = re.compile(
+    r'(\d{2}/\d{2}/\d{4})\s+([A-Za-z][A-Za-z .&\-]{0,80})\s+([0-9][0-9,]*\.?\d{0,2})(?=\s|CR\b|$)(?:\s*(CR)\b)?'
+)
+
+# Names are a single line of at most ~60 characters, so a match can no longer
+# run on into the neighbouring text
+_CUSTOMER_NAME_PATTERNS = [
+    re.compile(r'Customer Name\s*[:]?\s*([A-Za-z][A-Za-z .]{1,60}?)(?:\r?\n|$)', re.IGNORECASE),
+    re.compile(r'Cardholder\s*[:]?\s*([A-Za-z][A-Za-z .]{1,60}?)(?:\r?\n|$)', re.IGNORECASE),
+    re.compile(r'Name\s*[:]?\s*([A-Za-z][A-Za-z .]{1,60}?)(?:\r?\n|$)', re.IGNORECASE),
+    re.compile(r'^([A-Za-z][A-Za-z .]{1,60}?)\r?\n[^\n]{0,200}?Credit Card', re.IGNORECASE | re.MULTILINE),
+]
+
+_KNOWN_BANKS = [
+    "HDFC Bank", "ICICI Bank", "Axis Bank", "IDFC FIRST Bank",
+    "RBL Bank", "SBI Card", "Kotak Bank", "Standard Chartered",
+]
+_BANK_NAME_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        '(' + '|'.join(_KNOWN_BANKS) + ')',
+        r'([A-Za-z]+ Bank Limited)',
+        r'([A-Za-z]+ Card Services)',
+    ]
+]
+
+def _build_bank_automaton():
+    """Aho-Corasick automaton over the lowercased known bank names"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for bank in _KNOWN_BANKS:
+        automaton.add_word(bank.lower(), bank)
+    automaton.make_automaton()
+    return automaton
+
+_BANK_AUTOMATON = _build_bank_automaton()
+
+_DATE_PATTERNS = {
+    field: re.compile(pattern, re.IGNORECASE)
+    for field, pattern in {
+        "statement_date": r'(?:Statement Date|Date)[\s:]*(\d{2}/\d{2}/\d{4})',
+        "payment_due_date": r'(?:Payment Due Date|Due Date)[\s:]*(\d{2}/\d{2}/\d{4})',
+    }.items()
+}
+
+# Every extractor's "first match" patterns are scanned together in a single
+# pass when hyperscan is available, instead of each extractor re-reading the
+# whole statement; keys identify the pattern in the scan results
+_MULTI_SCAN_PATTERNS = {
+    ("card", 0): _CARD_NUMBER_MASKED_RE,
+    ("card", 1): _CARD_NO_RE,
+    ("card", 2): _CARD_NUMBER_FULL_RE,
+    ("card", 3): _CARD_NUMBER_ANY_RE,
+    **{("date", field): pattern for field, pattern in _DATE_PATTERNS.items()},
+    **{("reward", i): pattern for i, pattern in enumerate(_REWARD_PATTERNS)},
+    **{("name", i): pattern for i, pattern in enumerate(_CUSTOMER_NAME_PATTERNS)},
+    **{("bank", i): pattern for i, pattern in enumerate(_BANK_NAME_PATTERNS)},
+    ("transactions", 0): _TRANSACTION_SECTION_RE,
+}
+# Patterns hyperscan cannot compile (lookarounds, large bounded repeats under
+# leftmost-start tracking, \b with Unicode classes) are scanned by a looser
+# expression instead, usually their literal prefix. A scan match is a candidate
+# start; the real pattern is then searched from there
+_MULTI_SCAN_EXPRESSIONS = {
+    key: pattern.pattern for key, pattern in _MULTI_SCAN_PATTERNS.items()
+}
+_MULTI_SCAN_EXPRESSIONS.update({
+    ("transactions", 0): r'YOUR TRANSACTIONS',
+    ("card", 3): r'\d{4}[\*]+\d{4}',
+    ("reward", 1): r'Reward Points',
+    ("name", 0): r'Customer Name',
+    ("name", 1): r'Cardholder',
+    ("name", 2): r'Name',
+    ("name", 3): r'^[A-Za-z]',
+})
+
+def _hyperscan_flags(pattern: re.Pattern) -> int:
+    # UCP gives \s, \d and \w the same Unicode meaning they have in re
+    flags = hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+    if pattern.flags & re.IGNORECASE:
+        flags |= hyperscan.HS_FLAG_CASELESS
+    if pattern.flags & re.MULTILINE:
+        flags |= hyperscan.HS_FLAG_MULTILINE
+    if pattern.flags & re.DOTALL:
+        flags |= hyperscan.HS_FLAG_DOTALL
+    return flags
+
+def _build_multi_scan_database():
+    """
+    Compile the first-match patterns into one hyperscan database, returning
+    (database, keys by pattern id); patterns hyperscan rejects are left to re
+    """
+    if hyperscan is None:
+        return None, []
+    expressions, flags, keys = [], [], []
+    for key, pattern in _MULTI_SCAN_PATTERNS.items():
+        expression = _MULTI_SCAN_EXPRESSIONS[key].encode("utf-8")
+        try:
+            hyperscan.Database().compile(expressions=[expression], flags=[_hyperscan_flags(pattern)])
+        except Exception as e:
+            print(f"Hyperscan cannot compile {key}, using re for it: {e}")
+            continue
+        expressions.append(expression)
+        flags.append(_hyperscan_flags(pattern))
+        keys.append(key)
+    if not keys:
+        return None, []
+    try:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=expressions,
+            ids=list(range(len(keys))),
+            elements=len(keys),
+            flags=flags,
+        )
+        return database, keys
+    except Exception as e:
+        print(f"Hyperscan database compilation failed, using re fallback: {e}")
+        return None, []
+
+_MULTI_SCAN_DB, _MULTI_SCAN_KEYS = _build_multi_scan_database()
+_MULTI_SCAN_KEY_SET = frozenset(_MULTI_SCAN_KEYS)
+# A hyperscan scratch space serves one scan at a time; extractions run on the
+# default thread pool, so each thread allocates its own
+_MULTI_SCAN_SCRATCH = threading.local()
+
+def _multi_scan_scratch():
+    scratch = getattr(_MULTI_SCAN_SCRATCH, "scratch", None)
+    if scratch is None:
+        scratch = _MULTI_SCAN_SCRATCH.scratch = hyperscan.Scratch(_MULTI_SCAN_DB)
+    return scratch
+
+def _scan_first_offsets(text: str) -> Dict[Any, int]:
+    """
+    Single hyperscan pass over the text, returning the leftmost match start
+    (as a character offset) for every scanned pattern that matched
+    """
+    if _MULTI_SCAN_DB is None:
+        return {}
+    data = text.encode("utf-8")
+    byte_offsets: Dict[int, int] = {}
+
+    def on_match(pattern_id, start, end, flags, context):
+        if start < byte_offsets.get(pattern_id, len(data) + 1):
+            byte_offsets[pattern_id] = start
+
+    _MULTI_SCAN_DB.scan(data, match_event_handler=on_match, scratch=_multi_scan_scratch())
+    if text.isascii():
+        return {_MULTI_SCAN_KEYS[pattern_id]: start for pattern_id, start in byte_offsets.items()}
+    
+    # Convert byte offsets to character offsets in one forward walk
+    char_offsets = {}
+    position = chars = 0
+    for pattern_id, start in sorted(byte_offsets.items(), key=lambda item: item[1]):
+        chars += len(data[position:start].decode("utf-8"))
+        position = start
+        char_offsets[_MULTI_SCAN_KEYS[pattern_id]] = chars
+    return char_offsets
+
+def _search(key, text: str, offsets: Dict[Any, int]) -> Optional[re.Match]:
+    """
+    Equivalent of _MULTI_SCAN_PATTERNS[key].search(text); served from the
+    shared hyperscan pass (offsets, from _scan_first_offsets) when available
+    so the text is only traversed once
+    """
+    pattern = _MULTI_SCAN_PATTERNS[key]
+    if key not in _MULTI_SCAN_KEY_SET:
+        return pattern.search(text)
+    start = offsets.get(key)
+    if start is None:
+        return None
+    # Nothing matches before the leftmost scanned start, so searching from
+    # there finds the same match as re.search and recovers its capture groups
+    return pattern.search(text, start)
+
+_JSON_DECODER = json.JSONDecoder()
+# Tokens that need fixing in malformed JSON, matched in one left-to-right pass;
+# string literals are matched whole so their contents are never rewritten
+_JSON_REPAIR_RE = re.compile(
+    r'(?P<double>"(?:[^"\\]|\\.)*")'
+    r"|'(?P<single>(?:[^'\\]|\\.)*)'"
+    r'|(?P<comma>,)(?=\s*[}\]])'
+    r'|(?P<key>\w+)(?=\s*:)',
+    re.DOTALL
+)
 
 class ChatRequest(BaseModel):
-    question: str
+    model_config = ConfigDict(extra="ignore")
+
+    # Oversized questions are rejected with a 422 before they reach Gemini
+    question: Annotated[str, StringConstraints(max_length=CHAT_QUESTION_MAX_CHARS)]
     session_id: Optional[str] = "default"
 
 class OCRResponse(BaseModel):
@@ -74,24 +699,26 @@ class OCR10Response(BaseModel):
     extracted_data: Dict[str, Any]
     message: str
 
-def extract_text_with_pymupdf(pdf_content: bytes) -> Dict[str, Any]:
+# Worker processes for PDF page extraction, created in lifespan() on startup
+pdf_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+def open_pdf(pdf_source: Union[bytes, str]) -> fitz.Document:
+    """Open a PDF from in-memory bytes or from a file path (read lazily by MuPDF)"""
+    if isinstance(pdf_source, bytes):
+        return fitz.open(stream=pdf_source, filetype="pdf")
+    return fitz.open(pdf_source, filetype="pdf")
+
+def extract_pages_with_pymupdf(pdf_source: Union[bytes, str], start: int, stop: int,
+                               include_tables: bool = True) -> List[Dict[str, Any]]:
     """
-    Extract text, tables and images from PDF using PyMuPDF
-    This serves as our OCR function since we don't have direct Mistral OCR access
+    Extract text, tables and image count for pages [start, stop) of a PDF
+    Opens its own document handle so it can run in a worker process
+    Table detection is a second layout pass, so it only runs when requested
     """
+    pdf_document = open_pdf(pdf_source)
     try:
-        # Open PDF from bytes
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        
-        extracted_data = {
-            "text": "",
-            "tables": [],
-            "images_count": 0,
-            "pages": []  # Store individual pages for better processing
-        }
-        
-        # Extract text from each page
-        for page_num in range(len(pdf_document)):
+        pages = []
+        for page_num in range(start, stop):
             page = pdf_document[page_num]
             
             # Extract text
@@ -103,8 +730,8 @@ def extract_text_with_pymupdf(pdf_content: bytes) -> Dict[str, Any]:
             }
             
             # Extract tables (simple table detection)
-            tables = page.find_tables()
-            if tables.tables:
+            tables = page.find_tables() if include_tables else None
+            if tables and tables.tables:
                 for i, table in enumerate(tables.tables):
                     table_data = []
                     for row in table.extract():
@@ -113,82 +740,248 @@ def extract_text_with_pymupdf(pdf_content: bytes) -> Dict[str, Any]:
                         "table_number": i + 1,
                         "data": table_data
                     })
-                    extracted_data["tables"].append({
-                        "page": page_num + 1,
-                        "table_number": i + 1,
-                        "data": table_data
-                    })
-            
-            extracted_data["text"] += f"\n--- Page {page_num + 1} ---\n{text}"
-            extracted_data["pages"].append(page_data)
             
             # Count images
-            image_list = page.get_images()
-            extracted_data["images_count"] += len(image_list)
-        
+            pages.append((page_data, len(page.get_images())))
+        return pages
+    finally:
         pdf_document.close()
-        return extracted_data
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF processing error: {str(e)}")
 
-def call_gemini_api(prompt: str) -> str:
-    """Call Gemini API with given prompt"""
+def extract_text_with_pymupdf(pdf_source: Union[bytes, str], include_tables: bool = True) -> Dict[str, Any]:
+    """
+    Extract text, tables and images from PDF using PyMuPDF
+    This serves as our OCR function since we don't have direct Mistral OCR access
+    Text comes straight from the PDF's text layer; pages are never rendered to
+    images, and spooled uploads are opened by path rather than read into memory
+    Pages are split into contiguous ranges and extracted on the process pool
+    """
     try:
-        headers = {
-            "Content-Type": "application/json"
-        }
+        # Open PDF just to get the page count
+        pdf_document = open_pdf(pdf_source)
+        page_count = len(pdf_document)
+        pdf_document.close()
         
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }]
+        extracted_data = {
+            "text": "",
+            "tables": [],
+            "images_count": 0,
+            "pages": []  # Store individual pages for better processing
         }
         
-        response = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['candidates'][0]['content']['parts'][0]['text']
+        workers = min(PDF_EXTRACTION_WORKERS, page_count)
+        if workers <= 1 or pdf_extraction_pool is None:
+            page_results = extract_pages_with_pymupdf(pdf_source, 0, page_count, include_tables)
         else:
-            return f"Error: {response.status_code} - {response.text}"
+            chunk_size = -(-page_count // workers)
+            page_ranges = [
+                (start, min(start + chunk_size, page_count))
+                for start in range(0, page_count, chunk_size)
+            ]
+            futures = [
+                pdf_extraction_pool.submit(extract_pages_with_pymupdf, pdf_source, start, stop, include_tables)
+                for start, stop in page_ranges
+            ]
+            # Results are collected in submission order to preserve page order
+            page_results = [result for future in futures for result in future.result()]
+        
+        text_parts: List[str] = []
+        for page_data, images_count in page_results:
+            page_number = page_data["page_number"]
+            for table in page_data["tables"]:
+                extracted_data["tables"].append({
+                    "page": page_number,
+                    **table
+                })
             
+            text_parts.append(f"\n--- Page {page_number} ---\n{page_data['text']}")
+            extracted_data["pages"].append(page_data)
+            extracted_data["images_count"] += images_count
+        
+        extracted_data["text"] = "".join(text_parts)
+        return extracted_data
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF processing error: {str(e)}")
+
+def retry_delay(attempt: int) -> float:
+    """Jittered exponential backoff, capped at 8 s"""
+    return random.uniform(0, min(8, 2 ** attempt))
+
+async def post_with_retry(url: str, request_timeout: float = GEMINI_REQUEST_TIMEOUT, **kwargs) -> httpx.Response:
+    """
+    POST with a request_timeout deadline per attempt, retrying timed-out
+    attempts with jittered exponential backoff so one slow call does not hold
+    the request for the full client timeout. 429 responses are retried after
+    their Retry-After delay (capped at GEMINI_MAX_RETRY_AFTER_SECONDS).
+    Cancellation is never caught, so client disconnects and shutdown stop the
+    retries immediately.
+    """
+    for attempt in range(1, GEMINI_MAX_ATTEMPTS + 1):
+        try:
+            response = await asyncio.wait_for(
+                app.state.http.post(url, timeout=request_timeout, **kwargs),
+                timeout=request_timeout
+            )
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            if attempt == GEMINI_MAX_ATTEMPTS:
+                raise asyncio.TimeoutError(f"Gemini request timed out after {GEMINI_MAX_ATTEMPTS} attempts")
+            print(f"Gemini request timed out (attempt {attempt}/{GEMINI_MAX_ATTEMPTS}), retrying")
+            await asyncio.sleep(retry_delay(attempt))
+            continue
+        if response.status_code != 429 or attempt == GEMINI_MAX_ATTEMPTS:
+            return response
+        try:
+            delay = min(float(response.headers["Retry-After"]), GEMINI_MAX_RETRY_AFTER_SECONDS)
+        except (KeyError, ValueError):
+            delay = retry_delay(attempt)
+        print(f"Gemini rate limited (attempt {attempt}/{GEMINI_MAX_ATTEMPTS}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+class GeminiError(Exception):
+    """Gemini answered with an error status or a response without answer text"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+async def call_gemini_api(prompt: str, request_timeout: float = GEMINI_REQUEST_TIMEOUT) -> str:
+    """
+    Call Gemini API with given prompt, allowing request_timeout seconds per attempt
+    Raises GeminiError for error responses and asyncio.TimeoutError once every
+    attempt has timed out; callers decide how to report the failure
+    """
+    headers = {
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+    
+    response = await post_with_retry(
+        f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}",
+        request_timeout=request_timeout,
+        headers=headers,
+        json=payload
+    )
+    
+    if response.status_code != 200:
+        raise GeminiError(f"Gemini returned {response.status_code}: {response.text}", response.status_code)
+    try:
+        result = orjson.loads(response.content)
+        return result['candidates'][0]['content']['parts'][0]['text']
+    except (orjson.JSONDecodeError, KeyError, IndexError, TypeError):
+        raise GeminiError("Gemini response contained no answer text", response.status_code)
+
+async def stream_gemini_text(prompt: str) -> AsyncIterator[str]:
+    """Yield answer text from Gemini's server-sent-events stream as it arrives"""
+    payload = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+    async with app.state.http.stream(
+        "POST",
+        f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}",
+        headers={"Content-Type": "application/json"},
+        json=payload
+    ) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise GeminiError(f"Gemini returned {response.status_code}: {body.decode(errors='replace')}", response.status_code)
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            event = orjson.loads(line[5:])
+            for candidate in event.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+
+async def coalesce_chunks(chunks: AsyncIterator[str], window: float) -> AsyncIterator[str]:
+    """
+    Merge chunks that arrive within `window` seconds of the first chunk of a
+    batch, so fast token bursts go out as one write instead of many
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    next_chunk = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            try:
+                parts = [await next_chunk]
+            except StopAsyncIteration:
+                return
+            deadline = loop.time() + window
+            next_chunk = asyncio.ensure_future(iterator.__anext__())
+            while True:
+                done, _ = await asyncio.wait({next_chunk}, timeout=deadline - loop.time())
+                if not done:
+                    break
+                try:
+                    parts.append(next_chunk.result())
+                except StopAsyncIteration:
+                    yield "".join(parts)
+                    return
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+            yield "".join(parts)
+    finally:
+        next_chunk.cancel()
+
+async def call_gemini_stream(prompt: str) -> AsyncIterator[bytes]:
+    """
+    Stream a Gemini answer as server-sent events of {"text": ...} chunks
+    A failure ends the stream with an "error" event instead of "done"
+    """
+    try:
+        async for text in coalesce_chunks(stream_gemini_text(prompt), GEMINI_STREAM_COALESCE_SECONDS):
+            yield b"data: " + orjson.dumps({"text": text}) + b"\n\n"
     except Exception as e:
-        return f"API call failed: {str(e)}"
+        yield b"event: error\ndata: " + orjson.dumps({"error": str(e) or type(e).__name__}) + b"\n\n"
+        return
+    yield b"event: done\ndata: {}\n\n"
+
+def truncate_at_page_boundary(text: str, max_chars: int) -> str:
+    """
+    Truncate text to at most max_chars, cutting at the last page delimiter
+    so the model never sees a half page. The delimiter is only used when it
+    keeps at least half the budget; otherwise (e.g. a short first page before
+    a huge transactions page) the text is cut hard at max_chars
+    """
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n--- Page ", 0, max_chars + 1)
+    return text[:cut] if cut >= max_chars // 2 else text[:max_chars]
 
-def extract_card_number_from_text(text: str) -> Optional[str]:
+def extract_card_number_from_text(text: str, offsets: Optional[Dict[Any, int]] = None) -> Optional[str]:
     """
     Enhanced card number extraction using pattern matching
     Handles various formats: masked, partially masked, and full numbers
     """
+    offsets = _scan_first_offsets(text) if offsets is None else offsets
     # Pattern 1: Partially masked card numbers (XXXX*****XXXX)
-    pattern1 = r'Card Number\s*[:]?\s*(\d{4}[\*]+\d{4})'
-    match1 = re.search(pattern1, text, re.IGNORECASE)
+    match1 = _search(("card", 0), text, offsets)
     if match1:
         return match1.group(1)
     
     # Pattern 2: Another common format
-    pattern2 = r'Card No\s*[:]?\s*(\d{4}[\s\*]+\d{4})'
-    match2 = re.search(pattern2, text, re.IGNORECASE)
+    match2 = _search(("card", 1), text, offsets)
     if match2:
         return match2.group(1).replace(' ', '')
     
     # Pattern 3: Full card numbers (less common in statements)
-    pattern3 = r'Card Number\s*[:]?\s*(\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4})'
-    match3 = re.search(pattern3, text, re.IGNORECASE)
+    match3 = _search(("card", 2), text, offsets)
     if match3:
         return match3.group(1).replace(' ', '').replace('-', '')
     
     # Pattern 4: Look for any 16-digit number patterns
-    pattern4 = r'\b\d{4}[\*]+\d{4}\b'
-    match4 = re.search(pattern4, text)
+    match4 = _search(("card", 3), text, offsets)
     if match4:
         return match4.group(0)
     
@@ -200,23 +993,21 @@ def extract_financial_data_from_text(text: str) -> Dict[str, Any]:
     """
     financial_data = {}
     
-    # Amount patterns (with currency symbols and commas)
-    amount_patterns = {
-        "total_amount_due": r'(?:Total Amount Due|Total Due|New Balance)[\s:]*[₹$]?\s*([0-9,]+\.?[0-9]*)',
-        "minimum_amount_due": r'(?:Minimum Amount Due|Min Amount Due|Minimum Due|Min Due)[\s:]*[₹$]?\s*([0-9,]+\.?[0-9]*)',
-        "credit_limit": r'(?:Credit Limit|Limit)[\s:]*[₹$]?\s*([0-9,]+\.?[0-9]*)',
-        "available_credit_limit": r'(?:Available Credit Limit|Available Credit|Available Limit)[\s:]*[₹$]?\s*([0-9,]+\.?[0-9]*)',
-        "opening_balance": r'(?:Opening Balance|Previous Balance)[\s:]*[₹$]?\s*([0-9,]+\.?[0-9]*)',
-    }
-    
-    for field, pattern in amount_patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
+    # Amount labels followed by a value (with currency symbols and commas);
+    # the first labelled value for each field wins
+    for label in _AMOUNTS_RE.finditer(text):
+        field = _AMOUNT_LABEL_FIELDS[label.lastgroup]
+        if field in financial_data:
+            continue
+        match = _AMOUNT_VALUE_RE.match(text, label.end())
         if match:
             amount_str = match.group(1).replace(',', '')
             try:
                 financial_data[field] = float(amount_str)
             except ValueError:
                 financial_data[field] = None
+            if len(financial_data) == len(_AMOUNT_LABEL_FIELDS):
+                break
     
     # Calculate available credit if not found but credit limit and total due are available
     if (financial_data.get('credit_limit') is not None and 
@@ -228,10 +1019,11 @@ def extract_financial_data_from_text(text: str) -> Dict[str, Any]:
     
     return financial_data
 
-def extract_reward_points_from_text(text: str) -> Dict[str, Any]:
+def extract_reward_points_from_text(text: str, offsets: Optional[Dict[Any, int]] = None) -> Dict[str, Any]:
     """
     Enhanced reward points extraction using pattern matching
     """
+    offsets = _scan_first_offsets(text) if offsets is None else offsets
     rewards_data = {
         "opening_balance": None,
         "earned": None,
@@ -239,14 +1031,8 @@ def extract_reward_points_from_text(text: str) -> Dict[str, Any]:
     }
     
     # Multiple patterns for reward points
-    patterns = [
-        r'REWARDS\s*SUMMARY\s*Opening Balance\s*(\d+)\s*Rewards Earned\s*(\d+)\s*Redeemed/Adjusted\s*(\d+)\s*Closing Balance\s*(\d+)',
-        r'Reward Points.*?Opening Balance\s*(\d+).*?Earned\s*(\d+).*?Closing Balance\s*(\d+)',
-        r'Opening Balance\s*(\d+)\s*Rewards Earned\s*(\d+)\s*Closing Balance\s*(\d+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+    for i in range(len(_REWARD_PATTERNS)):
+        match = _search(("reward", i), text, offsets)
         if match:
             groups = match.groups()
             if len(groups) >= 3:
@@ -263,20 +1049,20 @@ def extract_reward_points_from_text(text: str) -> Dict[str, Any]:
     
     return rewards_data
 
-def extract_transactions_from_text(text: str) -> List[Dict[str, Any]]:
+def extract_transactions_from_text(text: str, offsets: Optional[Dict[Any, int]] = None) -> List[Dict[str, Any]]:
     """
     Extract transactions using pattern matching
     """
+    offsets = _scan_first_offsets(text) if offsets is None else offsets
     transactions = []
     
     # Look for transaction tables
-    transaction_section = re.search(r'YOUR TRANSACTIONS(.*?)(?=KEY OFFERS|Page \d+ of \d+|$)', text, re.IGNORECASE | re.DOTALL)
+    transaction_section = _search(("transactions", 0), text, offsets)
     if transaction_section:
         transaction_text = transaction_section.group(1)
         
         # Pattern for transaction rows (date, description, amount)
-        transaction_pattern = r'(\d{2}/\d{2}/\d{4})\s+([A-Za-z0-9\s\.\-&]+?)\s+([0-9,]+\.?[0-9]*)\s*(CR)?'
-        matches = re.findall(transaction_pattern, transaction_text)
+        matches = _TRANSACTION_ROW_RE.findall(transaction_text)
         
         for match in matches:
             date, description, amount_str, credit_indicator = match
@@ -295,94 +1081,103 @@ def extract_transactions_from_text(text: str) -> List[Dict[str, Any]]:
     
     return transactions
 
-def extract_customer_info_from_text(text: str) -> Dict[str, Any]:
+def extract_customer_info_from_text(text: str, offsets: Optional[Dict[Any, int]] = None) -> Dict[str, Any]:
     """
     Extract customer information using pattern matching
     """
+    offsets = _scan_first_offsets(text) if offsets is None else offsets
     customer_data = {
         "customer_name": None,
         "bank_name": None
     }
     
     # Extract customer name
-    name_patterns = [
-        r'Customer Name\s*[:]?\s*([A-Za-z\s]+)(?:\n|$)',
-        r'Cardholder\s*[:]?\s*([A-Za-z\s]+)(?:\n|$)',
-        r'Name\s*[:]?\s*([A-Za-z\s]+)(?:\n|$)',
-        r'^([A-Za-z\s]+)(?:\n.*?Credit Card)'
-    ]
-    
-    for pattern in name_patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+    for i in range(len(_CUSTOMER_NAME_PATTERNS)):
+        match = _search(("name", i), text, offsets)
         if match:
             customer_data["customer_name"] = match.group(1).strip()
             break
     
     # Extract bank name
-    bank_patterns = [
-        r'(HDFC Bank|ICICI Bank|Axis Bank|IDFC FIRST Bank|RBL Bank|SBI Card|Kotak Bank|Standard Chartered)',
-        r'([A-Za-z]+ Bank Limited)',
-        r'([A-Za-z]+ Card Services)'
-    ]
-    
-    for pattern in bank_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            customer_data["bank_name"] = match.group(1).strip()
-            break
+    customer_data["bank_name"] = find_known_bank(text, offsets)
+    if customer_data["bank_name"] is None:
+        for i in range(1, len(_BANK_NAME_PATTERNS)):
+            match = _search(("bank", i), text, offsets)
+            if match:
+                customer_data["bank_name"] = match.group(1).strip()
+                break
     
     return customer_data
 
-def extract_dates_from_text(text: str) -> Dict[str, Any]:
+def find_known_bank(text: str, offsets: Optional[Dict[Any, int]] = None) -> Optional[str]:
+    """
+    Find the first known bank name in the text. Uses the shared hyperscan pass
+    when it covers the bank list, else one Aho-Corasick scan, else a regex search
+    """
+    if ("bank", 0) in _MULTI_SCAN_KEY_SET or _BANK_AUTOMATON is None:
+        offsets = _scan_first_offsets(text) if offsets is None else offsets
+        match = _search(("bank", 0), text, offsets)
+        return match.group(1).strip() if match else None
+    
+    lowered = text.lower()
+    for end, bank in _BANK_AUTOMATON.iter(lowered):
+        # Known names never overlap, so the first to end is also the leftmost;
+        # return it as written in the statement when offsets line up
+        if len(lowered) != len(text):
+            return bank
+        return text[end - len(bank) + 1:end + 1]
+    return None
+
+def extract_dates_from_text(text: str, offsets: Optional[Dict[Any, int]] = None) -> Dict[str, Any]:
     """
     Extract dates using pattern matching
     """
+    offsets = _scan_first_offsets(text) if offsets is None else offsets
     date_data = {
         "statement_date": None,
         "payment_due_date": None
     }
     
     # Date patterns
-    date_patterns = {
-        "statement_date": r'(?:Statement Date|Date)[\s:]*(\d{2}/\d{2}/\d{4})',
-        "payment_due_date": r'(?:Payment Due Date|Due Date)[\s:]*(\d{2}/\d{2}/\d{4})'
-    }
-    
-    for field, pattern in date_patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
+    for field in _DATE_PATTERNS:
+        match = _search(("date", field), text, offsets)
         if match:
             date_data[field] = match.group(1)
     
     return date_data
 
-def extract_10_data_points_with_gemini(extracted_text: str) -> Dict[str, Any]:
+def extract_pattern_matched_data(extracted_text: str) -> Dict[str, Any]:
     """
-    Use Gemini model to extract the 10 specific data points from OCR text
+    Run all pattern-matching extractors over the OCR text and combine the results
+    The extractors run sequentially on purpose: their first-match lookups share
+    one scan of the text, and Python's re holds the GIL, so a thread pool
+    would only add overhead
     """
-    try:
-        # Extract data using pattern matching first (as fallback)
-        card_number = extract_card_number_from_text(extracted_text)
-        financial_data = extract_financial_data_from_text(extracted_text)
-        reward_points = extract_reward_points_from_text(extracted_text)
-        transactions = extract_transactions_from_text(extracted_text)
-        customer_info = extract_customer_info_from_text(extracted_text)
-        dates_info = extract_dates_from_text(extracted_text)
-        
-        # Combine all pattern-matched data
-        pattern_matched_data = {
-            **customer_info,
-            **dates_info,
-            **financial_data,
-            'card_number': card_number,
-            'transactions': transactions,
-            'reward_points_summary': reward_points
-        }
-        
-        prompt = f"""
+    offsets = _scan_first_offsets(extracted_text)
+    card_number = extract_card_number_from_text(extracted_text, offsets)
+    financial_data = extract_financial_data_from_text(extracted_text)
+    reward_points = extract_reward_points_from_text(extracted_text, offsets)
+    transactions = extract_transactions_from_text(extracted_text, offsets)
+    customer_info = extract_customer_info_from_text(extracted_text, offsets)
+    dates_info = extract_dates_from_text(extracted_text, offsets)
+    
+    # Combine all pattern-matched data
+    return {
+        **customer_info,
+        **dates_info,
+        **financial_data,
+        'card_number': card_number,
+        'transactions': transactions,
+        'reward_points_summary': reward_points
+    }
+
+# Prompt for the 10 data point extraction; filled in only when Gemini is
+# actually called (pattern matching incomplete and no cached result)
+_EXTRACT_10_PROMPT_TEMPLATE = """
 CRITICAL TASK: Extract ALL 11 data points from this credit card statement. DO NOT skip any field.
 
 EXTRACTED TEXT FROM ALL PAGES:
-{extracted_text[:20000]}  # Large context for comprehensive extraction
+{statement_text}  # Large context for comprehensive extraction
 
 MANDATORY INSTRUCTIONS:
 1. You MUST extract ALL 11 fields below. NO "null" or "N/A" allowed unless absolutely impossible to find.
@@ -447,14 +1242,14 @@ DATA POINTS TO EXTRACT:
     - Patterns: "HDFC", "ICICI", "Axis", "IDFC FIRST", "RBL"
 
 PRE-EXTRACTED DATA (for verification):
-- Customer Name: {pattern_matched_data.get('customer_name')}
-- Statement Date: {pattern_matched_data.get('statement_date')}
-- Payment Due Date: {pattern_matched_data.get('payment_due_date')}
+- Customer Name: {customer_name}
+- Statement Date: {statement_date}
+- Payment Due Date: {payment_due_date}
 - Financial Data: {financial_data}
 - Card Number: {card_number}
 - Reward Points: {reward_points}
-- Transactions Count: {len(transactions)}
-- Bank Name: {pattern_matched_data.get('bank_name')}
+- Transactions Count: {transactions_count}
+- Bank Name: {bank_name}
 
 CALCULATION RULES (use if direct extraction fails):
 - Available Credit = Credit Limit - Total Amount Due
@@ -488,7 +1283,43 @@ IMPORTANT:
 - No explanations, no partial data
 """
 
-        response = call_gemini_api(prompt)
+async def extract_10_data_points_with_gemini(extracted_text: str, force_llm: bool = False) -> Tuple[Dict[str, Any], bool]:
+    """
+    Use Gemini model to extract the 10 specific data points from OCR text
+    Gemini is skipped when pattern matching already found every field, unless force_llm is set
+    Returns (data, used_fallback); used_fallback is True when Gemini failed and
+    the data is the incomplete pattern-matched result
+    """
+    # Extract data using pattern matching first (as fallback); the regex
+    # work is CPU-bound so it runs off the event loop
+    pattern_matched_data = await asyncio.to_thread(extract_pattern_matched_data, extracted_text)
+    
+    try:
+        if not force_llm and is_complete(pattern_matched_data):
+            return create_complete_dataset(pattern_matched_data), False
+        
+        financial_data = {
+            field: pattern_matched_data[field]
+            for field in _AMOUNT_LABEL_FIELDS.values()
+            if field in pattern_matched_data
+        }
+        card_number = pattern_matched_data['card_number']
+        reward_points = pattern_matched_data['reward_points_summary']
+        transactions = pattern_matched_data['transactions']
+        
+        prompt = _EXTRACT_10_PROMPT_TEMPLATE.format(
+            statement_text=truncate_at_page_boundary(extracted_text, GEMINI_MAX_STATEMENT_CHARS),
+            customer_name=pattern_matched_data.get('customer_name'),
+            statement_date=pattern_matched_data.get('statement_date'),
+            payment_due_date=pattern_matched_data.get('payment_due_date'),
+            financial_data=financial_data,
+            card_number=card_number,
+            reward_points=reward_points,
+            transactions_count=len(transactions),
+            bank_name=pattern_matched_data.get('bank_name')
+        )
+
+        response = await call_gemini_api(prompt, request_timeout=GEMINI_EXTRACTION_TIMEOUT)
         print("Gemini Raw Response:", response[:1000] + "..." if len(response) > 1000 else response)
         
         # Extract JSON from response
@@ -498,12 +1329,12 @@ IMPORTANT:
         extracted_data = robust_data_merging(extracted_data, pattern_matched_data)
         
         # Final validation and calculations
-        return final_validation_and_calculation(extracted_data)
+        return final_validation_and_calculation(extracted_data), False
         
     except Exception as e:
         print(f"Error in data extraction: {e}")
         # Return pattern-matched data as fallback
-        return create_complete_dataset(pattern_matched_data)
+        return create_complete_dataset(pattern_matched_data), True
 
 def robust_data_merging(ai_data: Dict[str, Any], pattern_data: Dict[str, Any]) -> Dict[str, Any]:
     """Robust merging of AI data with pattern-matched data"""
@@ -560,6 +1391,16 @@ def is_valid_data(value: Any) -> bool:
         return False
     return True
 
+def is_complete(data: Dict[str, Any]) -> bool:
+    """Check if all 11 data points, including every reward points field, are valid"""
+    if not all(is_valid_data(data.get(field)) for field in create_complete_fallback_data()):
+        return False
+    reward_points = data['reward_points_summary']
+    return all(
+        is_valid_data(reward_points.get(field))
+        for field in ['opening_balance', 'earned', 'closing_balance']
+    )
+
 def final_validation_and_calculation(data: Dict[str, Any]) -> Dict[str, Any]:
     """Final validation and calculation of missing fields"""
     validated_data = create_complete_fallback_data()
@@ -618,38 +1459,43 @@ def create_complete_dataset(pattern_data: Dict[str, Any]) -> Dict[str, Any]:
 
 def extract_json_from_response(response: str) -> Dict[str, Any]:
     """Extract JSON from AI response using multiple strategies"""
-    # Strategy 1: Direct JSON match
-    json_match = re.search(r'\{[\s\S]*\}', response)
-    if json_match:
-        json_str = json_match.group()
+    start = response.find('{')
+    if start != -1:
+        # Strategy 1: Decode the first JSON object, ignoring surrounding text
         try:
-            return json.loads(json_str)
+            data, _ = _JSON_DECODER.raw_decode(response, start)
+            return data
         except json.JSONDecodeError:
-            # Strategy 2: Clean common JSON issues
-            json_str = clean_json_string(json_str)
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                pass
+            pass
+        
+        # Strategy 2: Clean common JSON issues
+        try:
+            data, _ = _JSON_DECODER.raw_decode(clean_json_string(response[start:]))
+            return data
+        except json.JSONDecodeError:
+            pass
     
     return create_complete_fallback_data()
 
-def clean_json_string(json_str: str) -> str:
-    """Clean common JSON formatting issues"""
-    # Remove trailing commas
-    json_str = re.sub(r',\s*}', '}', json_str)
-    json_str = re.sub(r',\s*]', ']', json_str)
-    
+def _repair_json_token(match: re.Match) -> str:
+    if match.group('double') is not None:
+        return match.group('double')
+    if match.group('single') is not None:
+        # Re-quote single-quoted strings with double quotes
+        content = match.group('single').replace("\\'", "'").replace('"', '\\"')
+        return f'"{content}"'
+    if match.group('comma') is not None:
+        # Remove trailing commas
+        return ''
     # Fix missing quotes around keys
-    json_str = re.sub(r'(\w+):', r'"\1":', json_str)
-    
-    # Fix single quotes to double quotes
-    json_str = json_str.replace("'", '"')
-    
-    # Remove any text before {
-    json_str = re.sub(r'^[^{]*', '', json_str)
-    
-    return json_str
+    return f'"{match.group("key")}"'
+
+def clean_json_string(json_str: str) -> str:
+    """
+    Clean common JSON formatting issues (trailing commas, unquoted keys,
+    single-quoted strings) in one pass, leaving string contents untouched
+    """
+    return _JSON_REPAIR_RE.sub(_repair_json_token, json_str)
 
 def create_complete_fallback_data() -> Dict[str, Any]:
     """Create a complete fallback data structure with all 11 fields"""
@@ -671,33 +1517,69 @@ def create_complete_fallback_data() -> Dict[str, Any]:
         "bank_name": None
     }
 
+async def read_pdf_upload(file: UploadFile) -> Tuple[Union[bytes, str], str]:
+    """
+    Read an uploaded PDF, returning (bytes or temp file path, content hash)
+    Small uploads are read into memory; larger ones are copied to a temp file
+    in chunks so MuPDF can read them from disk. The caller removes the temp file.
+    """
+    pdf_hash = hashlib.blake2b(digest_size=16)
+    if file.size is not None and file.size <= PDF_IN_MEMORY_MAX_BYTES:
+        pdf_content = await file.read()
+        pdf_hash.update(pdf_content)
+        return pdf_content, pdf_hash.hexdigest()
+    
+    spool = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    try:
+        with spool:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                # Disk writes are blocking, so keep them off the event loop
+                await asyncio.to_thread(spool.write, chunk)
+                pdf_hash.update(chunk)
+    except BaseException:
+        # The path never reaches the caller, so clean up here (also on cancellation)
+        os.remove(spool.name)
+        raise
+    return spool.name, pdf_hash.hexdigest()
+
 @app.post("/ocr", response_model=OCRResponse)
-async def process_ocr(file: UploadFile = File(...)):
+async def process_ocr(file: UploadFile = File(...), include_tables: bool = Query(False)):
     """
     Process PDF with OCR to extract text, tables and images
+    Table detection is skipped unless include_tables=true
     """
+    pdf_source = None
     try:
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
         
         # Read file content
-        pdf_content = await file.read()
+        pdf_source, pdf_hash = await read_pdf_upload(file)
         
-        # Extract content using PyMuPDF (serving as our OCR)
-        extracted_data = extract_text_with_pymupdf(pdf_content)
+        # Reuse the extraction of an identical upload if its session is still
+        # around and has tables whenever this request needs them
+        cached_session_id = await session_store.get_upload_session(pdf_hash)
+        extracted_data = await session_store.get(cached_session_id) if cached_session_id else None
+        if extracted_data is None or (include_tables and not extracted_data.get("tables_extracted")):
+            # Extract content using PyMuPDF (serving as our OCR)
+            extracted_data = await asyncio.to_thread(extract_text_with_pymupdf, pdf_source, include_tables)
+            extracted_data["tables_extracted"] = include_tables
         
         # Generate session ID
         session_id = str(uuid.uuid4())
         
         # Store extracted content
-        extracted_contents[session_id] = {
+        await session_store.set(session_id, {
             "text": extracted_data["text"],
             "tables": extracted_data["tables"],
             "images_count": extracted_data["images_count"],
             "pages": extracted_data["pages"],
+            "tables_extracted": extracted_data["tables_extracted"],
             "filename": file.filename,
+            "pdf_hash": pdf_hash,
             "processed_at": datetime.now().isoformat()
-        }
+        })
+        await session_store.set_upload_session(pdf_hash, session_id)
         
         return OCRResponse(
             success=True,
@@ -717,26 +1599,38 @@ async def process_ocr(file: UploadFile = File(...)):
             session_id="",
             message=f"Error processing PDF: {str(e)}"
         )
+    finally:
+        if isinstance(pdf_source, str):
+            os.remove(pdf_source)
 
 @app.get("/ocr-10", response_model=OCR10Response)
-async def get_ocr_extract_10(session_id: str = Query(...)):
+async def get_ocr_extract_10(session_id: str = Query(...), force_llm: bool = Query(False)):
     """
     Extract 10 specific data points using Gemini model from a previously processed PDF
+    force_llm=true always calls Gemini and bypasses cached results (for debugging)
     """
-    if session_id not in extracted_contents:
+    stored_content = await session_store.get(session_id)
+    if stored_content is None:
         raise HTTPException(status_code=404, detail="Session not found. Please process a PDF first.")
     
-    stored_content = extracted_contents[session_id]
     extracted_text = stored_content.get("text")
     
     if not extracted_text:
         raise HTTPException(status_code=400, detail="No text found in the session to process.")
 
-    # Use enhanced extraction with better error handling
-    extracted_10_data = extract_10_data_points_with_gemini(extracted_text)
+    # Use enhanced extraction with better error handling, unless the same PDF
+    # has already been through it
+    pdf_hash = stored_content.get("pdf_hash")
+    extracted_10_data = None if force_llm or not pdf_hash else await session_store.get_extracted_10(pdf_hash)
+    if extracted_10_data is None:
+        extracted_10_data, used_fallback = await extract_10_data_points_with_gemini(extracted_text, force_llm)
+        # A degraded fallback result is not cached, so the next request retries Gemini
+        if pdf_hash and not used_fallback:
+            await session_store.set_extracted_10(pdf_hash, extracted_10_data)
     
     # Store the newly extracted data back into the session
-    extracted_contents[session_id]["extracted_10_data"] = extracted_10_data
+    stored_content["extracted_10_data"] = extracted_10_data
+    await session_store.set(session_id, stored_content)
     
     return OCR10Response(
         success=True,
@@ -753,11 +1647,10 @@ async def chat_with_pdf(chat_request: ChatRequest):
     try:
         session_id = chat_request.session_id
         
-        if session_id not in extracted_contents:
+        pdf_content = await session_store.get(session_id)
+        if pdf_content is None:
             raise HTTPException(status_code=404, detail="Session not found. Please process a PDF first.")
         
-        pdf_content = extracted_contents[session_id]
-        
         # Get the extracted 10 data points if available
         extracted_data = pdf_content.get("extracted_10_data", {})
         
@@ -766,7 +1659,7 @@ async def chat_with_pdf(chat_request: ChatRequest):
         CREDIT CARD STATEMENT ANALYSIS CONTEXT:
 
         EXTRACTED STRUCTURED DATA:
-        {json.dumps(extracted_data, indent=2)}
+        {orjson.dumps(extracted_data, option=orjson.OPT_INDENT_2).decode()}
 
         ADDITIONAL TEXT CONTEXT (for reference):
         {pdf_content['text'][:4000]}
@@ -796,7 +1689,7 @@ async def chat_with_pdf(chat_request: ChatRequest):
         Please provide a well-structured, visually appealing response to the user's question.
         """
         
-        answer = call_gemini_api(prompt)
+        answer = await call_gemini_api(prompt)
         
         return ChatResponse(
             success=True,
@@ -811,24 +1704,202 @@ async def chat_with_pdf(chat_request: ChatRequest):
             session_id=chat_request.session_id
         )
 
-@app.post("/chat", response_model=GeneralChatResponse)
-async def general_chat(chat_request: ChatRequest):
+# Static halves of the general chat prompt, split once at import so each
+# request only concatenates the question in between
+_GENERAL_CHAT_PROMPT_HEAD, _GENERAL_CHAT_PROMPT_TAIL = """
+        You are a helpful, knowledgeable AI assistant. You can discuss any topic the user is interested in.
+        
+        However, if the user asks about you, your capabilities, or who created you, please mention:
+        "This is made by Yash Buddhadev as an assignment for Sure Financials. For more details, drop an email at yashbuddhadev21@gmail.com"
+        
+        User Question: {question}
+        
+        Please provide a helpful, engaging response.
+        """.split("{question}")
+
+def build_general_chat_prompt(question: str) -> str:
+    """Prompt for the general support chat"""
+    return _GENERAL_CHAT_PROMPT_HEAD + question + _GENERAL_CHAT_PROMPT_TAIL
+
+def build_batched_chat_prompt(questions: List[str], marker: str) -> str:
     """
-    General support chat - No limits, user can ask anything
+    Prompt answering several general chat questions in one Gemini call
+    Headings carry a per-batch random marker so answers can be split reliably
     """
-    try:
-        prompt = f"""
+    numbered_questions = "\n\n".join(
+        f"### Q{i}-{marker}\n{question}" for i, question in enumerate(questions, 1)
+    )
+    return f"""
         You are a helpful, knowledgeable AI assistant. You can discuss any topic the user is interested in.
         
         However, if the user asks about you, your capabilities, or who created you, please mention:
         "This is made by Yash Buddhadev as an assignment for Sure Financials. For more details, drop an email at yashbuddhadev21@gmail.com"
         
-        User Question: {chat_request.question}
+        Below are {len(questions)} unrelated questions from different users. Answer each one
+        independently with a helpful, engaging response. Start each answer with its own
+        heading line "### A1-{marker}", "### A2-{marker}", ... matching the question number,
+        and write nothing before the first heading.
         
-        Please provide a helpful, engaging response.
+{numbered_questions}
         """
-        
-        answer = call_gemini_api(prompt)
+
+def split_batched_answers(response: str, count: int, marker: str) -> List[Optional[str]]:
+    """
+    Split a batched Gemini response on its ### A<n>-<marker> headings (None
+    where an answer is missing). Headings are only accepted in strict order
+    A1, A2, ..., so any other heading text stays inside the current answer
+    """
+    heading_re = re.compile(rf'^[ \t]*#{{2,4}}[ \t]*A(\d+)-{marker}\b[^\n]*\n?', re.MULTILINE)
+    answers: List[Optional[str]] = [None] * count
+    index, start = -1, 0
+    for heading in heading_re.finditer(response):
+        if index + 1 >= count or int(heading.group(1)) != index + 2:
+            continue
+        if index >= 0:
+            answers[index] = response[start:heading.start()].strip() or None
+        index, start = index + 1, heading.end()
+    if index >= 0:
+        answers[index] = response[start:].strip() or None
+    return answers
+
+class ChatBatcher:
+    """
+    Coalesce /chat questions arriving within `window` seconds (up to
+    `max_size` of them) into a single Gemini call, then split the numbered
+    answers back out to each waiting request. Trades a few milliseconds of
+    latency for far fewer requests against Gemini's per-minute limits.
+
+    Questions from different users share one prompt, so a question can still
+    steer how the model answers the others; only general chat, which carries
+    no session data, is batched.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self._window = window
+        self._max_size = max_size
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._collector: Optional[asyncio.Task] = None
+        self._dispatches: set = set()
+
+    def start(self) -> None:
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        tasks = [self._collector, *self._dispatches]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def ask(self, question: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((question, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._window
+            while len(batch) < self._max_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without waiting so the next batch collects while Gemini answers this one
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        batch = [(question, future) for question, future in batch if not future.done()]
+        if not batch:
+            return
+        # Each entry is the answer or the exception raised while getting it
+        answers: List[Union[str, BaseException, None]]
+        try:
+            if len(batch) == 1:
+                answers = [await call_gemini_api(build_general_chat_prompt(batch[0][0]))]
+            else:
+                marker = secrets.token_hex(4)
+                response = await call_gemini_api(build_batched_chat_prompt([question for question, _ in batch], marker))
+                answers = split_batched_answers(response, len(batch), marker)
+                missing = [i for i, answer in enumerate(answers) if answer is None]
+                if missing:
+                    print(f"Batched chat response missing {len(missing)} of {len(batch)} answers, asking separately")
+                    retried = await asyncio.gather(*(
+                        call_gemini_api(build_general_chat_prompt(batch[i][0])) for i in missing
+                    ), return_exceptions=True)
+                    for i, answer in zip(missing, retried):
+                        answers[i] = answer
+        except asyncio.CancelledError:
+            # Shutting down: cancel the waiting requests instead of leaving them hanging
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            answers = [e] * len(batch)
+        for (_, future), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, BaseException):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+class ChatAnswerCache:
+    """
+    General chat answers keyed by a blake2b hash of the normalized question
+    (lowercased, whitespace collapsed), so repeated FAQ-style questions skip
+    Gemini. Stored in Redis when available so all workers share hits.
+    """
+
+    KEY_PREFIX = "chat:"
+
+    def __init__(self, ttl_seconds: int, redis: Optional["aioredis.Redis"] = None):
+        self._ttl_seconds = ttl_seconds
+        self._redis = redis
+        self._answers: Dict[str, Tuple[float, str]] = {}
+
+    @classmethod
+    def key(cls, question: str) -> str:
+        normalized = " ".join(question.lower().split())
+        return cls.KEY_PREFIX + hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+    async def get(self, question: str) -> Optional[str]:
+        key = self.key(question)
+        if self._redis is not None:
+            answer = await self._redis.get(key)
+            return answer.decode() if answer is not None else None
+        entry = self._answers.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._answers[key]
+            return None
+        return entry[1]
+
+    async def set(self, question: str, answer: str) -> None:
+        key = self.key(question)
+        if self._redis is not None:
+            await self._redis.set(key, answer, ex=self._ttl_seconds)
+            return
+        self._answers.pop(key, None)
+        if len(self._answers) >= CHAT_CACHE_MAX_ENTRIES:
+            # Entries are in insertion order, so the first one is the oldest
+            del self._answers[next(iter(self._answers))]
+        self._answers[key] = (time.monotonic() + self._ttl_seconds, answer)
+
+@app.post("/chat", response_model=GeneralChatResponse)
+async def general_chat(chat_request: ChatRequest):
+    """
+    General support chat - No limits, user can ask anything
+    """
+    try:
+        answer = await app.state.chat_cache.get(chat_request.question)
+        if answer is None:
+            # Gemini failures (GeminiError, timeouts) raise and are never cached
+            answer = await app.state.chat_batcher.ask(chat_request.question)
+            await app.state.chat_cache.set(chat_request.question, answer)
         
         return GeneralChatResponse(
             success=True,
@@ -841,69 +1912,108 @@ async def general_chat(chat_request: ChatRequest):
             answer=f"Error: {str(e)}"
         )
 
+@app.post("/chat/stream")
+async def general_chat_stream(chat_request: ChatRequest):
+    """
+    General support chat, streamed as server-sent events while Gemini generates
+    """
+    return StreamingResponse(
+        call_gemini_stream(build_general_chat_prompt(chat_request.question)),
+        media_type="text/event-stream"
+    )
+
+# The root document never changes, so it is serialized once at import
+_ROOT_BYTES = orjson.dumps({
+    "message": "Credit Card Statement Parser API is running!",
+    "endpoints": {
+        "POST /ocr": "Process PDF to extract text, tables, images",
+        "GET /ocr-10": "Extract 10 common data points from processed PDF",
+        "POST /chatwithpdf": "Chat specifically about the uploaded PDF content",
+        "POST /chat": "General chat about any topic",
+        "POST /chat/stream": "General chat streamed as server-sent events",
+        "GET /healthz": "Liveness check",
+        "GET /sessions": "List all active sessions",
+        "GET /session/{session_id}": "Get specific session data (include=extracted_10_data for the data points)"
+    }
+})
+
 @app.get("/")
 async def root():
-    return {
-        "message": "Credit Card Statement Parser API is running!",
-        "endpoints": {
-            "POST /ocr": "Process PDF to extract text, tables, images",
-            "GET /ocr-10": "Extract 10 common data points from processed PDF",
-            "POST /chatwithpdf": "Chat specifically about the uploaded PDF content",
-            "POST /chat": "General chat about any topic",
-            "GET /sessions": "List all active sessions",
-            "GET /session/{session_id}": "Get specific session data"
-        }
-    }
+    # A fresh Response per request: middleware appends headers to the
+    # response's header list, so a shared instance would accumulate them
+    return Response(content=_ROOT_BYTES, media_type="application/json")
+
+@app.api_route("/healthz", methods=["GET", "HEAD"], response_class=PlainTextResponse)
+async def healthz():
+    """Liveness probe for load balancers and orchestrators"""
+    return "ok"
 
-@app.get("/sessions")
+@app.get("/sessions", response_class=OrjsonResponse)
 async def list_sessions():
     """List all active sessions (for debugging)"""
     sessions_info = {}
-    for session_id, content in extracted_contents.items():
+    for session_id, meta in await session_store.meta_items():
         sessions_info[session_id] = {
-            "filename": content.get("filename", "Unknown"),
-            "processed_at": content.get("processed_at", "Unknown"),
-            "text_length": len(content.get("text", "")),
-            "tables_count": len(content.get("tables", [])),
-            "pages_count": len(content.get("pages", [])),
-            "has_extracted_data": "extracted_10_data" in content
+            "filename": meta["filename"],
+            "processed_at": meta["processed_at"],
+            "text_length": meta["text_length"],
+            "tables_count": meta["tables_count"],
+            "pages_count": meta["pages_count"],
+            "has_extracted_data": meta["has_extracted_10_data"]
         }
     
     return {
         "active_sessions": sessions_info,
-        "session_count": len(extracted_contents)
+        "session_count": len(sessions_info)
     }
 
-@app.get("/session/{session_id}")
-async def get_session_data(session_id: str):
-    """Get stored data for a specific session"""
-    if session_id in extracted_contents:
-        content = extracted_contents[session_id]
-        # Don't return full text in response to avoid huge payloads
-        return {
-            "success": True,
-            "session_id": session_id,
-            "filename": content.get("filename"),
-            "processed_at": content.get("processed_at"),
-            "text_length": len(content.get("text", "")),
-            "tables_count": len(content.get("tables", [])),
-            "pages_count": len(content.get("pages", [])),
-            "images_count": content.get("images_count", 0),
-            "has_extracted_10_data": "extracted_10_data" in content,
-            "extracted_10_data": content.get("extracted_10_data", {})
-        }
+@app.get("/session/{session_id}", response_class=OrjsonResponse)
+async def get_session_data(session_id: str, include: Set[str] = Query(default=set())):
+    """
+    Get stored data for a specific session
+    Heavy fields are opt-in: include=extracted_10_data adds the extracted data points
+    """
+    # One store lookup either way: the small summary by default, or the heavy
+    # blob (summarized on the spot) when the extracted data points are requested
+    if "extracted_10_data" in include:
+        content = await session_store.get(session_id)
+        meta = summarize_session(content) if content is not None else None
     else:
+        content = None
+        meta = await session_store.get_meta(session_id)
+    if meta is None:
         raise HTTPException(status_code=404, detail="Session not found")
+    
+    # Don't return full text in response to avoid huge payloads
+    session_data = {
+        "success": True,
+        "session_id": session_id,
+        **{field: value for field, value in meta.items() if field != "pdf_hash"}
+    }
+    if content is not None:
+        session_data["extracted_10_data"] = content.get("extracted_10_data", {})
+    return session_data
 
-@app.delete("/session/{session_id}")
+@app.delete("/session/{session_id}", response_class=OrjsonResponse)
 async def delete_session(session_id: str):
     """Delete a specific session"""
-    if session_id in extracted_contents:
-        del extracted_contents[session_id]
+    if await session_store.delete(session_id):
         return {"success": True, "message": "Session deleted successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Sessions are only shared between workers through Redis, so without it
+    # stay on a single worker unless WEB_CONCURRENCY says otherwise
+    default_workers = (os.cpu_count() or 1) if REDIS_URL else 1
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", default_workers)),
+        loop="auto",  # uvloop and httptools when installed (uvicorn[standard])
+        http="auto",
+        log_level="info",
+        limit_max_requests=10000
+    )
\ No newline at end of file
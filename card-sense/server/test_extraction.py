@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+
+STATEMENT_TEXT = """
+--- Page 1 ---
+HDFC Bank Credit Card Statement
+Customer Name: Asha Verma
+Card Number: 4321 XXXX XXXX 9876
+Statement Date: 01/02/2024
+Payment Due Date: 21/02/2024
+Total Amount Due: 12,345.67
+Minimum Amount Due: 617.28
+Credit Limit: 200,000.00
+Available Credit Limit: 187,654.33
+Reward Points Summary
+Opening Balance Earned Closing Balance
+1200 340 1540
+YOUR TRANSACTIONS
+05/01/2024 AMAZON INDIA 1,299.00
+09/01/2024 SWIGGY 450.50
+15/01/2024 PAYMENT RECEIVED 10,000.00 CR
+"""
+
+
+def test_pattern_extraction_is_thread_safe():
+    # Each text is distinct so a mixed-up scan would show in the results
+    texts = [STATEMENT_TEXT + "\n" * i + "filler line\n" * 2000 for i in range(32)]
+    expected = [main.extract_pattern_matched_data(text) for text in texts]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(main.extract_pattern_matched_data, texts))
+
+    assert results == expected
+    assert expected[0]["statement_date"] == "01/02/2024"
+    assert expected[0]["transactions"]
+
+
+def test_scan_agrees_with_re_on_unicode_text():
+    texts = [
+        STATEMENT_TEXT.replace(": ", ":\xa0"),
+        STATEMENT_TEXT.replace(" ", "\u2003"),
+        "Statement Date:\xa001/02/2024 Card ١٢٣٤**٥٦٧٨",
+    ]
+    for text in texts:
+        offsets = main._scan_first_offsets(text)
+        for key, pattern in main._MULTI_SCAN_PATTERNS.items():
+            expected = pattern.search(text)
+            match = main._search(key, text, offsets)
+            assert (match and match.span()) == (expected and expected.span()), key
+
+
+def test_transaction_credit_marker_variants():
+    text = (
+        "YOUR TRANSACTIONS\n"
+        "01/01/2024 PAYMENT 500.00CR\n"
+        "02/01/2024 REFUND 20.00\nCR\n"
+        "03/01/2024 SHOP 1,000.00 CR\n"
+        "04/01/2024 FOOD 12.50\n"
+    )
+    amounts = [row["amount"] for row in main.extract_transactions_from_text(text)]
+    assert amounts == [-500.0, -20.0, -1000.0, 12.5]
+
+
+def test_amount_after_wide_gap_is_read_whole():
+    text = "Total Amount Due" + " " * 55 + "12,345.67"
+    assert main.extract_financial_data_from_text(text) == {"total_amount_due": 12345.67}
@@ -270,7 +270,7 @@ export default function HomePage() {
 
     try {
       // First, call /ocr to get the session_id and full data
-      const ocrResponse = await fetch(`${API_BASE_URL}/ocr`, {
+      const ocrResponse = await fetch(`${API_BASE_URL}/ocr?include_tables=true`, {
         method: "POST",
         body: formData,
       });